@@ -1,313 +1,493 @@
-"""
-Created on Tuesday 30-01-2024
-@author: Lars Gehin, S4082338
-@email: l.m.gehin@student.rug.nl
-
-This script generates a visual representation of seagrass mapping using Folium and GeoPandas.
-The process involves generating random coordinate data within a specified geographical area,
-creating GeoDataFrames, and mapping seagrass data onto a grid. The resulting map includes
-layers for seagrass quantity, method categorization, hover data, and a legend.
-
-This script maps the number of seagrass plants and their planting method per plot. It can generate
-random example data to use the script if there is no data available. The script first generates a plots
-based on the coordinates of the measurements provided in the data. It does this by converting the coordinates
-to their corresponding UTM coordinates to create the plots and then converts them back to the original coordinates
-so they can be used for the map. The script the creates a interactive map of the data. It colors the plots according
-to the number of plants present in that plot and colors the border according to the planting method used in that
-plot. It then creates the map in html format and opens it in your browser.
-
-Functions:
-- generate_random_data: Generates random coordinate data with associated seagrass quantity and method categorization.
-- style_function: Defines a style function for GeoJSON features based on the 'method' property.
-- create_grid_df: Reads coordinate data, converts it into GeoDataFrame, and creates a grid around the points.
-- create_empty_map: Creates an empty Folium map centered at a specified latitude and longitude.
-- create_seagrass_map: Adds the number of seagrass plants to the grid plots and colors them accordingly.
-- create_methods_map: Adds a colored border to the grid plots according to the method used in that plot.
-- create_hover_data: Adds hover data to the existing Folium map, showing plot number, method, and number of plants.
-- create_legend: Adds a legend to an existing Folium map.
-
-"""
-import random
-import pandas as pd
-import geopandas as gpd
-from shapely.geometry import box, Point
-import folium
-import webbrowser
-
-def generate_random_data(min_lat, max_lat, min_lon, max_lon, num_rows, file_name, seed=None):
-    """
-    Generates a text file containing random coordinate data within a specified geographical area.
-    The area is defined by the minimum and maximum latitudes and longitudes.
-
-    min_lat: The minimum latitude of the geographical area
-    max_lat: The maximum latitude of the geographical area
-    min_lon: The minimum longitude of the geographical area
-    max_lon: The maximum longitude of the geographical area
-    num_rows: The number of data points to generate
-    file_name: The name of the file to write the generated data to
-
-    The generated file contains columns: cell, latitude, longitude, n_seagrass_plants, method
-    - cell: Unique identifier for each data point
-    - latitude: Randomly generated latitude within the specified geographical area
-    - longitude: Randomly generated longitude within the specified geographical area
-    - n_seagrass_plants: Randomly generated number of seagrass plants (0 to 100)
-    - method: Categorization of data points into four methods based on their order (1 to 4)
-    """
-    random.seed(seed)
-
-    with open(file_name, 'w') as output:
-        output.write(f"cell\tlatitude\tlongitude\tn_seagrass_plants\tmethod\n")
-        for i in range(num_rows):
-            cell = (i + 1)
-            n_plants = random.randint(0, 100)
-            lat = min_lat + random.random() * (max_lat - min_lat)
-            lon = min_lon + random.random() * (max_lon - min_lon)
-
-            if i < 25:
-                method = str('1')
-            elif i < 50:
-                method = str('2')
-            elif i < 75:
-                method = str('3')
-            else:
-                method = str('4')
-
-            output.write('%d\t%.6f\t%.6f\t%d\t%s\n' % (cell, lat, lon, n_plants, method))
-
-
-def style_function(feature):
-    """
-        Defines a style function for GeoJSON features based on the 'method' property.
-        Assigns colors and line weights to GeoJSON features depending on their 'method' values.
-        This can then be used to plot these colors on the map.
-
-        Parameters:
-        feature: A GeoJSON feature with properties, including 'method'
-
-        Method-color mappings:
-        - Method 1: Orange with a line weight of 4
-        - Method 2: Red with a line weight of 4
-        - Method 3: Blue with a line weight of 4
-        - Method 4: Yellow with a line weight of 4
-
-        """
-    if feature['properties']['method'] == 1:
-        return {'color': 'orange', 'weight': 4}
-
-    elif feature['properties']['method'] == 2:
-        return {'color': 'red', 'weight': 4}
-
-    elif feature['properties']['method'] == 3:
-        return {'color': 'blue', 'weight': 4}
-
-    elif feature['properties']['method'] == 4:  # Add styles for other treatments or default case
-        return {'color': 'Yellow', 'weight': 4}
-
-
-def create_grid_df(file_name, utm, grid_size):
-    """
-        Reads coordinate data from a file, converts it into GeoDataFrame, and creates a grid around the points
-    	with the points as center of the grid. The gridsize is in meters. The grid size is the total width/height of the plot.
-
-        Parameters:
-        - file_name: Name of the file containing the coordinate data
-        - utm: UTM zone for coordinate conversion (enter appropriate UTM for your coordinates)
-        - grid_size: Size of the grid in meters around the center points
-
-        """
-    df = pd.read_csv(file_name, sep='\t', header=0)
-
-    # Convert DataFrame to GeoDataFrame
-    points = df.apply(lambda row: Point(row.longitude, row.latitude), axis=1)
-    seagrass = gpd.GeoDataFrame(df, geometry=points)
-    seagrass.crs = {'init': 'epsg:4326'}
-
-    # Convert GeoDataFrame to UTM coordinates
-    gdf = seagrass.to_crs(epsg=utm)  # Replace 32633 with the appropriate UTM zone for your location
-
-    # Create a grid with the specified size around the center points
-    grid_geometries = [box(point.x - grid_size / 2, point.y - grid_size / 2,
-                           point.x + grid_size / 2, point.y + grid_size / 2)
-                       for point in gdf['geometry']]
-
-    grid_df = gpd.GeoDataFrame(geometry=grid_geometries, crs=gdf.crs)
-
-    # Convert grid GeoDataFrame back to WGS84
-    grid_df = grid_df.to_crs(epsg=4326)
-
-    # Add columns from the original DataFrame
-    grid_df['n_plants'] = seagrass['n_seagrass_plants']
-    grid_df['cell'] = seagrass['cell']
-    grid_df['method'] = seagrass['method']
-
-    return gdf, grid_df
-
-
-def create_empty_map(lat, lon):
-    """
-        Creates an empty Folium map centered at a specified latitude and longitude.
-
-        Parameters:
-        - lat: Latitude for the center of the map
-        - lon: Longitude for the center of the map
-
-        """
-    m = folium.Map([lat, lon], zoom_start=15)
-
-    return m
-
-
-def create_seagrass_map(grid_df, gdf, m):
-    """
-        Adds the number of plants to the grid plots and colors them accordingly.
-    	This layer is then added to the previously created map.
-
-        Parameters:
-        - grid_df: GeoDataFrame representing the grid
-        - gdf: GeoDataFrame with original coordinate data
-        - m: Folium map object
-
-        """
-
-    folium.Choropleth(
-        geo_data=grid_df.to_json(),
-        name="choropleth",
-        data=gdf,
-        key_on="feature.properties.cell",
-        columns=["cell", "n_seagrass_plants"],
-        fill_color="YlGn",
-        fill_opacity=1,
-        legend_name="Number of plants in plot",
-    ).add_to(m)
-
-    return m
-
-
-def create_methods_map(grid_df, m):
-    """
-        Adds a colored border to the grid plots according to the method used in that plot.
-        This layer is then added to the previously created map.
-
-        Parameters:
-        - grid_df: GeoDataFrame representing the grid
-        - m: Folium map object
-
-        """
-    folium.GeoJson(
-        grid_df,
-        name='Methods',
-        style_function=style_function
-    ).add_to(m)
-
-
-def create_hover_data(grid_df, style_f, highlight_f, m):
-    """
-      Adds hover data to the existing Folium map. When you hover over the plots with your cursor
-      you can see the data of the plot: the plot number, the method and the number of plants in that plot.
-
-      Parameters:
-      - grid_df: GeoDataFrame representing the grid
-      - style_f: Style function for GeoJSON features
-      - highlight_f: Highlight function for GeoJSON features
-      - m: Folium map object
-
-      """
-
-    hd = folium.features.GeoJson(
-        grid_df,
-        style_function=style_f,
-        control=False,
-        highlight_function=highlight_f,
-        tooltip=folium.features.GeoJsonTooltip(
-            fields=['cell', 'method', 'n_plants'],  # use fields from the json file
-            aliases=['Plot number: ', 'Method: ', 'Number of plants: '],
-            style=("background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;")
-        )
-    )
-    m.add_child(hd)
-    m.keep_in_front(hd)
-
-
-def create_legend(m):
-    """
-        Adds a legend to an existing Folium map.
-
-        Parameters:
-        - m: Folium map object
-
-        """
-    legend_html = '''
-         <div style="position: fixed; 
-                     bottom: 50px; right: 50px; width: 120px; height: 130px; 
-                     border:2px solid grey; z-index:9999; font-size:14px;
-                     background-color:rgba(255, 255, 255, 0.8);
-                     border-radius: 8px;
-                     ">
-         &nbsp; <strong>Legend</strong> <br>
-         &nbsp; Method 1 &nbsp; <i style="background:orange; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
-         &nbsp; Method 2 &nbsp; <i style="background:red; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
-         &nbsp; Method 3 &nbsp; <i style="background:blue; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
-         &nbsp; Method 4 &nbsp; <i style="background:yellow; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
-         </div>
-         '''
-    m.get_root().html.add_child(folium.Element(legend_html))
-    # Add layer control
-    folium.LayerControl().add_to(m)
-
-
-if __name__ == '__main__':
-    # variable needed in the functions
-    min_lat, max_lat, min_lon, max_lon = 51.4459, 51.4521, 4.1828, 4.2032
-    num_rows = 100
-    file_name = 'random_lat_lon.txt'
-    utm = 32631
-    grid_size = 20
-    lat = 51.4501
-    lon = 4.1901
-
-    # Generate random data
-
-    #print(f"Generating random latitude, longitude, plant count and method data")
-    #Setting a seed to keep the data reproducible
-    #generate_random_data(min_lat, max_lat, min_lon, max_lon, num_rows, file_name, seed=100)
-
-    # Create GeoDataFrames and location grid dataframe
-    print(f"Creating GeoDataFrame and grid data frame from {file_name}")
-    gdf, grid_df = create_grid_df(file_name, utm, grid_size)
-
-    # Create an empty folium map
-    print(f"Generating an empty folium map")
-    m = create_empty_map(lat, lon)
-
-    # Add a location grid with corresponding method colors to the map
-    print(f"Adding methods to the folium map")
-    create_methods_map(grid_df, m)
-
-    # Add a location grid with corresponding plant counts to the map
-    print(f"Adding plant counts to the map")
-    create_seagrass_map(grid_df, gdf, m)
-
-    # Styling for the hover data
-    style_f = lambda x: {'fillColor': '#ffffff',
-                         'color': '#000000',
-                         'fillOpacity': 0.1,
-                         'weight': 0.1}
-    highlight_f = lambda x: {'fillColor': '#000000',
-                             'color': '#000000',
-                             'fillOpacity': 0.50,
-                             'weight': 0.1}
-
-    print(f"Adding hover marks to the map")
-    create_hover_data(grid_df, style_f, highlight_f, m)
-
-    # Add legend to the map
-    print(f"Adding a legend to the map")
-    create_legend(m)
-
-    # Save or display the map
-    print(f"Saving the map as seagrass_map.html and opening the map in your browser")
-    m.save("seagrass_map.html")
-    webbrowser.open("seagrass_map.html")
-
-    print(f"Script complete!")
-    print(f"ALL DONE!")
+"""
+Created on Tuesday 30-01-2024
+@author: Lars Gehin, S4082338
+@email: l.m.gehin@student.rug.nl
+
+This script generates a visual representation of seagrass mapping using Folium and GeoPandas.
+The process involves generating random coordinate data within a specified geographical area,
+creating a grid GeoDataFrame, and mapping seagrass data onto that grid. The resulting map includes
+layers for seagrass quantity, method categorization, hover data, and a legend.
+
+This script maps the number of seagrass plants and their planting method per plot. It can generate
+random example data to use the script if there is no data available. The script first generates a plots
+based on the coordinates of the measurements provided in the data. It does this by converting the plot size
+in meters to degrees around each measurement coordinate, so the plots can be used for the map directly. The script the creates a interactive map of the data. It colors the plots according
+to the number of plants present in that plot and colors the border according to the planting method used in that
+plot. It then creates the map in html format and opens it in your browser.
+
+Functions:
+- generate_random_data: Generates random coordinate data with associated seagrass quantity and method categorization.
+- style_function: Defines a style function for GeoJSON features based on the 'method' property.
+- create_grid_df: Reads coordinate data, converts it into GeoDataFrame, and creates a grid around the points.
+- load_or_create_grid_df: Wraps create_grid_df with an on-disk cache keyed by the input file and parameters.
+- build_grid_features: Converts the grid GeoDataFrame into a GeoJSON FeatureCollection dict for the map layers.
+- create_empty_map: Creates an empty Folium map centered at a specified latitude and longitude.
+- create_seagrass_map: Adds the number of seagrass plants to the grid plots and colors them accordingly.
+- create_methods_map: Adds a colored border to the grid plots according to the method used in that plot.
+- create_hover_data: Adds hover data to the existing Folium map, showing plot number, method, and number of plants.
+- create_legend: Adds a legend to an existing Folium map.
+- build_map: Runs the whole pipeline for one input file and saves the map.
+- build_maps: Builds the maps for a batch of input files in parallel.
+
+"""
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import folium
+import webbrowser
+
+# pyarrow's multithreaded CSV reader parses large input files much faster
+# than the default pandas parser; fall back if it is unavailable
+try:
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
+
+def _read_data(file_name):
+    """
+        Reads the tab-separated coordinate data file into a DataFrame, using
+        the multithreaded pyarrow CSV reader when available and falling back
+        to pandas otherwise.
+
+        Parameters:
+        - file_name: Name of the file containing the coordinate data
+
+        """
+    if pacsv is not None:
+        table = pacsv.read_csv(file_name, parse_options=pacsv.ParseOptions(delimiter='\t'))
+        return table.to_pandas()
+
+    return pd.read_csv(file_name, sep='\t', header=0)
+
+
+def generate_random_data(min_lat, max_lat, min_lon, max_lon, num_rows, file_name, seed=None):
+    """
+    Generates a text file containing random coordinate data within a specified geographical area.
+    The area is defined by the minimum and maximum latitudes and longitudes.
+
+    min_lat: The minimum latitude of the geographical area
+    max_lat: The maximum latitude of the geographical area
+    min_lon: The minimum longitude of the geographical area
+    max_lon: The maximum longitude of the geographical area
+    num_rows: The number of data points to generate
+    file_name: The name of the file to write the generated data to
+
+    The generated file contains columns: cell, latitude, longitude, n_seagrass_plants, method
+    - cell: Unique identifier for each data point
+    - latitude: Randomly generated latitude within the specified geographical area
+    - longitude: Randomly generated longitude within the specified geographical area
+    - n_seagrass_plants: Randomly generated number of seagrass plants (0 to 100)
+    - method: Categorization of data points into four methods based on their order (1 to 4)
+    """
+    rng = np.random.default_rng(seed)
+
+    # Draw all rows at once with numpy instead of calling the random module
+    # and writing the file row by row
+    lats = rng.uniform(min_lat, max_lat, num_rows)
+    lons = rng.uniform(min_lon, max_lon, num_rows)
+    n_plants = rng.integers(0, 101, num_rows)
+
+    # Divide the rows over the four methods in order, as before
+    quarter = num_rows // 4
+    methods = np.full(num_rows, 4)
+    methods[:3 * quarter] = np.repeat([1, 2, 3], quarter)
+
+    data = pd.DataFrame({'cell': np.arange(1, num_rows + 1),
+                         'latitude': lats,
+                         'longitude': lons,
+                         'n_seagrass_plants': n_plants,
+                         'method': methods})
+    data.to_csv(file_name, sep='\t', index=False, float_format='%.6f')
+
+
+# Style per method, looked up by style_function for every GeoJSON feature
+_STYLE_TABLE = {1: {'color': 'orange', 'weight': 4},
+                2: {'color': 'red', 'weight': 4},
+                3: {'color': 'blue', 'weight': 4},
+                4: {'color': 'Yellow', 'weight': 4}}
+
+
+def style_function(feature):
+    """
+        Defines a style function for GeoJSON features based on the 'method' property.
+        Assigns colors and line weights to GeoJSON features depending on their 'method' values.
+        This can then be used to plot these colors on the map.
+
+        Parameters:
+        feature: A GeoJSON feature with properties, including 'method'
+
+        Method-color mappings:
+        - Method 1: Orange with a line weight of 4
+        - Method 2: Red with a line weight of 4
+        - Method 3: Blue with a line weight of 4
+        - Method 4: Yellow with a line weight of 4
+        - Unknown methods fall back to gray
+
+        """
+    return _STYLE_TABLE.get(feature['properties']['method'], {'color': 'gray', 'weight': 4})
+
+
+def create_grid_df(file_name, utm, grid_size):
+    """
+        Reads coordinate data from a file, converts it into GeoDataFrame, and creates a grid around the points
+    	with the points as center of the grid. The gridsize is in meters. The grid size is the total width/height of the plot.
+
+        Parameters:
+        - file_name: Name of the file containing the coordinate data
+        - utm: UTM zone, kept for compatibility (the grid is now built directly in degrees)
+        - grid_size: Size of the grid in meters around the center points
+
+        Returns the plain DataFrame with the input columns and the grid GeoDataFrame.
+
+        """
+    df = _read_data(file_name)
+
+    # Shrink the integer columns: methods are 1-4 and plant counts 0-100, so
+    # int8/int16 suffice. This also fixes string-typed method columns, whose
+    # values would never match the integer keys of the style table.
+    df['method'] = df['method'].astype('int8')
+    df['n_seagrass_plants'] = df['n_seagrass_plants'].astype('int16')
+
+    lat = df['latitude'].to_numpy()
+    lon = df['longitude'].to_numpy()
+
+    # Compute the grid corners directly in degrees with a local equirectangular
+    # approximation: at grid sizes of tens of meters the corners land within
+    # centimeters of the UTM-derived ones, far below what is visible on the
+    # map, so the UTM roundtrip is not needed for the boxes
+    dlat = grid_size / 2 / 111320.0
+    dlon = grid_size / 2 / (111320.0 * np.cos(np.radians(lat)))
+    minx, miny, maxx, maxy = lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+    # Build all grid boxes in one call by stacking the ring coordinates into
+    # an (N, 5, 2) array, instead of constructing box() per row in Python
+    rings = np.stack([np.stack([minx, maxx, maxx, minx, minx], axis=1),
+                      np.stack([miny, miny, maxy, maxy, miny], axis=1)], axis=2)
+    grid_geometries = shapely.polygons(rings)
+
+    grid_df = gpd.GeoDataFrame(geometry=grid_geometries, crs="EPSG:4326")
+
+    # Add columns from the original DataFrame
+    grid_df['n_plants'] = df['n_seagrass_plants']
+    grid_df['cell'] = df['cell']
+    grid_df['method'] = df['method']
+
+    return df, grid_df
+
+
+def load_or_create_grid_df(file_name, utm, grid_size, use_cache=True):
+    """
+        Returns the GeoDataFrames from create_grid_df, reusing a pickled copy
+        on disk when the input file and parameters have not changed. The cache
+        file is keyed by a hash of the file contents together with the utm and
+        grid_size values, so a stale cache can never be loaded by accident.
+
+        Parameters:
+        - file_name: Name of the file containing the coordinate data
+        - utm: UTM zone for coordinate conversion
+        - grid_size: Size of the grid in meters around the center points
+        - use_cache: Set to False to always rebuild (e.g. with --no-cache)
+
+        """
+    with open(file_name, 'rb') as data:
+        digest = hashlib.blake2b(data.read() + f"{utm}:{grid_size}".encode(),
+                                 digest_size=16).hexdigest()
+    cache_path = f".cache_{digest}.pkl"
+
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, 'rb') as cache:
+            return pickle.load(cache)
+
+    df, grid_df = create_grid_df(file_name, utm, grid_size)
+
+    if use_cache:
+        with open(cache_path, 'wb') as cache:
+            pickle.dump((df, grid_df), cache, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return df, grid_df
+
+
+def build_grid_features(grid_df):
+    """
+        Builds a GeoJSON FeatureCollection dict from the grid GeoDataFrame.
+        The geometries are written by shapely's vectorized GeoJSON writer and
+        the properties come from a single to_dict pass, which is much faster
+        than geopandas' per-row iterfeatures loop.
+
+        Parameters:
+        - grid_df: GeoDataFrame representing the grid
+
+        """
+    properties = grid_df.drop(columns='geometry').to_dict(orient='records')
+    geometries = shapely.to_geojson(grid_df.geometry.values)
+
+    features = [{'type': 'Feature', 'id': i, 'geometry': json.loads(geom), 'properties': props}
+                for i, (geom, props) in enumerate(zip(geometries, properties))]
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def create_empty_map(lat, lon):
+    """
+        Creates an empty Folium map centered at a specified latitude and longitude.
+
+        Parameters:
+        - lat: Latitude for the center of the map
+        - lon: Longitude for the center of the map
+
+        """
+    m = folium.Map([lat, lon], zoom_start=15)
+
+    return m
+
+
+def create_seagrass_map(grid_features, m):
+    """
+        Adds the number of plants to the grid plots and colors them accordingly.
+    	This layer is then added to the previously created map.
+
+        Parameters:
+        - grid_features: GeoJSON FeatureCollection dict representing the grid
+        - m: Folium map object
+
+        """
+    # Color each plot from the n_plants value already embedded in its feature
+    # properties, so the browser does not have to join a separate data table
+    # on the cell number like folium.Choropleth does
+    n_plants = [feature['properties']['n_plants'] for feature in grid_features['features']]
+    colormap = folium.LinearColormap(['#ffffe5', '#005a32'],
+                                     vmin=min(n_plants), vmax=max(n_plants),
+                                     caption="Number of plants in plot")
+
+    folium.GeoJson(
+        grid_features,
+        name="choropleth",
+        style_function=lambda feature: {'fillColor': colormap(feature['properties']['n_plants']),
+                                        'fillOpacity': 1,
+                                        'weight': 0}
+    ).add_to(m)
+    colormap.add_to(m)
+
+    return m
+
+
+def create_methods_map(grid_features, m):
+    """
+        Adds a colored border to the grid plots according to the method used in that plot.
+        This layer is then added to the previously created map and returned, so
+        the hover tooltip can be attached to it.
+
+        Parameters:
+        - grid_features: GeoJSON FeatureCollection dict representing the grid
+        - m: Folium map object
+
+        """
+    methods_layer = folium.GeoJson(
+        grid_features,
+        name='Methods',
+        style_function=style_function
+    )
+    methods_layer.add_to(m)
+
+    return methods_layer
+
+
+def create_hover_data(grid_features, style_f, highlight_f, m):
+    """
+      Adds hover data to the existing Folium map. When you hover over the plots with your cursor
+      you can see the data of the plot: the plot number, the method and the number of plants in that plot.
+
+      Parameters:
+      - grid_features: GeoJSON FeatureCollection dict representing the grid
+      - style_f: Style function for GeoJSON features
+      - highlight_f: Highlight function for GeoJSON features
+      - m: Folium map object
+
+      """
+
+    hd = folium.features.GeoJson(
+        grid_features,
+        style_function=style_f,
+        control=False,
+        highlight_function=highlight_f,
+        tooltip=folium.features.GeoJsonTooltip(
+            fields=['cell', 'method', 'n_plants'],  # use fields from the json file
+            aliases=['Plot number: ', 'Method: ', 'Number of plants: '],
+            style=("background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;")
+        )
+    )
+    m.add_child(hd)
+    m.keep_in_front(hd)
+
+
+def create_legend(m):
+    """
+        Adds a legend to an existing Folium map.
+
+        Parameters:
+        - m: Folium map object
+
+        """
+    legend_html = '''
+         <div style="position: fixed; 
+                     bottom: 50px; right: 50px; width: 120px; height: 130px; 
+                     border:2px solid grey; z-index:9999; font-size:14px;
+                     background-color:rgba(255, 255, 255, 0.8);
+                     border-radius: 8px;
+                     ">
+         &nbsp; <strong>Legend</strong> <br>
+         &nbsp; Method 1 &nbsp; <i style="background:orange; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
+         &nbsp; Method 2 &nbsp; <i style="background:red; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
+         &nbsp; Method 3 &nbsp; <i style="background:blue; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
+         &nbsp; Method 4 &nbsp; <i style="background:yellow; width:20px; height:10px; display:inline-block; border:1px solid black; border-radius: 4px;"></i><br>
+         </div>
+         '''
+    m.get_root().html.add_child(folium.Element(legend_html))
+    # Add layer control
+    folium.LayerControl().add_to(m)
+
+
+def build_map(file_name, utm, grid_size, lat, lon, out="seagrass_map.html",
+              use_cache=True, rich_hover=False):
+    """
+        Runs the whole pipeline for one input file: builds the grid, adds all
+        the layers and the legend, and saves the map as out (plus a gzipped
+        copy). Returns the path of the saved HTML file.
+
+        Parameters:
+        - file_name: Name of the file containing the coordinate data
+        - utm: UTM zone, kept for compatibility
+        - grid_size: Size of the grid in meters around the center points
+        - lat: Latitude for the center of the map
+        - lon: Longitude for the center of the map
+        - out: Name of the HTML file to save the map to
+        - use_cache: Set to False to always rebuild the grid
+        - rich_hover: Add the separate hover layer instead of the tooltip
+
+        """
+    # Create GeoDataFrames and location grid dataframe, reusing the on-disk
+    # cache from a previous run unless disabled
+    print(f"Creating GeoDataFrame and grid data frame from {file_name}")
+    df, grid_df = load_or_create_grid_df(file_name, utm, grid_size, use_cache)
+
+    # Build the grid feature dict once and reuse it for every map layer
+    grid_features = build_grid_features(grid_df)
+
+    # Create an empty folium map
+    print(f"Generating an empty folium map")
+    m = create_empty_map(lat, lon)
+
+    # Add a location grid with corresponding method colors to the map
+    print(f"Adding methods to the folium map")
+    methods_layer = create_methods_map(grid_features, m)
+
+    # Add a location grid with corresponding plant counts to the map
+    print(f"Adding plant counts to the map")
+    create_seagrass_map(grid_features, m)
+
+    print(f"Adding hover marks to the map")
+    if rich_hover:
+        # Separate hover layer with its own styling and highlighting; this
+        # duplicates the grid geometry in the page, so it is opt-in
+        style_f = lambda x: {'fillColor': '#ffffff',
+                             'color': '#000000',
+                             'fillOpacity': 0.1,
+                             'weight': 0.1}
+        highlight_f = lambda x: {'fillColor': '#000000',
+                                 'color': '#000000',
+                                 'fillOpacity': 0.50,
+                                 'weight': 0.1}
+        create_hover_data(grid_features, style_f, highlight_f, m)
+    else:
+        # Attach the tooltip to the methods layer that is already on the map,
+        # instead of adding a third layer with the full grid geometry again
+        folium.features.GeoJsonTooltip(
+            fields=['cell', 'method', 'n_plants'],  # use fields from the json file
+            aliases=['Plot number: ', 'Method: ', 'Number of plants: '],
+            style=("background-color: white; color: #333333; font-family: arial; font-size: 12px; padding: 10px;")
+        ).add_to(methods_layer)
+        m.keep_in_front(methods_layer)
+
+    # Add legend to the map
+    print(f"Adding a legend to the map")
+    create_legend(m)
+
+    # Save the map
+    print(f"Saving the map as {out}")
+    m.save(out)
+
+    # Also write a gzip-compressed copy; the embedded GeoJSON compresses
+    # well, so this is the one to serve or archive for large grids
+    with open(out, 'rb') as page:
+        with gzip.open(out + ".gz", 'wb', compresslevel=6) as compressed:
+            compressed.write(page.read())
+
+    return out
+
+
+def build_maps(file_names, utm, grid_size, lat, lon, n_jobs=-1):
+    """
+        Builds one map per input file, in parallel across CPU cores when
+        joblib is available. The geometry construction and serialization
+        release the GIL through numpy and shapely, and the loky backend runs
+        separate processes anyway, so batch runs over many sites scale with
+        the number of cores. Each map is saved next to its input file with
+        the .txt extension replaced by .html.
+
+        Parameters:
+        - file_names: List of files containing the coordinate data
+        - utm: UTM zone, kept for compatibility
+        - grid_size: Size of the grid in meters around the center points
+        - lat: Latitude for the center of the maps
+        - lon: Longitude for the center of the maps
+        - n_jobs: Number of parallel jobs (-1 uses all cores)
+
+        """
+    outputs = [os.path.splitext(name)[0] + ".html" for name in file_names]
+
+    try:
+        from joblib import Parallel, delayed
+    except ImportError:
+        # Without joblib, just build the maps one after the other
+        return [build_map(name, utm, grid_size, lat, lon, out)
+                for name, out in zip(file_names, outputs)]
+
+    return Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(build_map)(name, utm, grid_size, lat, lon, out)
+        for name, out in zip(file_names, outputs))
+
+
+if __name__ == '__main__':
+    # variable needed in the functions
+    min_lat, max_lat, min_lon, max_lon = 51.4459, 51.4521, 4.1828, 4.2032
+    num_rows = 100
+    file_name = 'random_lat_lon.txt'
+    utm = 32631
+    grid_size = 20
+    lat = 51.4501
+    lon = 4.1901
+
+    # Generate random data
+
+    #print(f"Generating random latitude, longitude, plant count and method data")
+    #Setting a seed to keep the data reproducible
+    #generate_random_data(min_lat, max_lat, min_lon, max_lon, num_rows, file_name, seed=100)
+
+    # Build the map and open it in the browser
+    out = build_map(file_name, utm, grid_size, lat, lon,
+                    use_cache='--no-cache' not in sys.argv,
+                    rich_hover='--rich-hover' in sys.argv)
+
+    print(f"Opening the map in your browser")
+    webbrowser.open(out)
+
+    print(f"Script complete!")
+    print(f"ALL DONE!")